@@ -1,7 +1,7 @@
 # detector/folder_worker.py
-import argparse, time, random, csv, sys, io
+import argparse, asyncio, os, time, random, csv, sys, io
 from pathlib import Path
-import requests
+import aiohttp
 from PIL import Image
 
 def log_local(csv_path: Path, row: dict):
@@ -13,94 +13,126 @@ def log_local(csv_path: Path, row: dict):
             w.writeheader()
         w.writerow(row)
 
-def post_match(api_url: str, img_bytes: bytes, thr: float, camera: str) -> dict:
-    files = {"file": ("frame.jpg", img_bytes, "image/jpeg")}
+async def post_match(session: aiohttp.ClientSession, api_url: str, img_bytes: bytes,
+                     thr: float, camera: str) -> dict:
+    form = aiohttp.FormData()
+    form.add_field("file", img_bytes, filename="frame.jpg", content_type="image/jpeg")
     params = {"thr": str(thr), "camera": camera}
-    r = requests.post(f"{api_url}/match", files=files, params=params, timeout=20)
-    r.raise_for_status()
-    return r.json()
+    async with session.post(f"{api_url}/match", data=form, params=params,
+                            timeout=aiohttp.ClientTimeout(total=20)) as r:
+        r.raise_for_status()
+        return await r.json()
 
-def post_event(api_url: str, person: str, score: float, camera: str):
+async def post_event(session: aiohttp.ClientSession, api_url: str, person: str, score: float, camera: str):
     # server-side event logger (even for non-matches)
     payload = {"person": person, "score": float(score), "camera": camera}
     try:
-        requests.post(f"{api_url}/events", json=payload, timeout=10)
-    except requests.exceptions.RequestException:
+        async with session.post(f"{api_url}/events", json=payload,
+                                timeout=aiohttp.ClientTimeout(total=10)):
+            pass
+    except (aiohttp.ClientError, asyncio.TimeoutError):
         # non-fatal: keep going even if /events fails
         pass
 
+IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+
+def list_images(folder: Path) -> list[Path]:
+    # one directory pass (vs. a glob per extension); suffix match is case-insensitive
+    with os.scandir(folder) as it:
+        return sorted(Path(e.path) for e in it
+                      if e.is_file() and e.name.lower().endswith(IMAGE_EXTS))
+
 def read_image_as_jpeg_bytes(path: Path) -> bytes:
+    raw = path.read_bytes()
+    # already JPEG: send as-is, no decode/re-encode round-trip
+    if raw[:3] == b"\xff\xd8\xff":
+        return raw
     # normalize to JPEG to avoid content-type mismatches (e.g., PNG/HEIC)
-    with Image.open(path) as im:
+    with Image.open(io.BytesIO(raw)) as im:
         buf = io.BytesIO()
         if im.mode not in ("RGB", "L"):
             im = im.convert("RGB")
         im.save(buf, format="JPEG", quality=90)
         return buf.getvalue()
 
+async def process_image(session: aiohttp.ClientSession, api_url: str, img: Path, args):
+    ts = time.strftime("%Y-%m-%d %H:%M:%S")
+    try:
+        img_bytes = await asyncio.to_thread(read_image_as_jpeg_bytes, img)
+        resp = await post_match(session, api_url, img_bytes, args.thr, args.camera)
+
+        if "best" in resp:
+            name = resp["best"]["name"]
+            score = float(resp["best"]["score"])
+            match = bool(resp["best"]["match"])
+            sym = "✅" if match else "❌"
+            print(f"{sym} {img.name:30s} → {name:12s}  score={score:.3f}  thr={args.thr}  cam={args.camera}")
+
+            # client-side CSV log
+            log_local(Path(args.log), {
+                "ts": ts, "camera": args.camera, "image": img.name,
+                "best_name": name, "best_score": f"{score:.3f}",
+                "match": "1" if match else "0", "thr": f"{args.thr:.2f}",
+            })
+
+            # server-side event for ALL frames:
+            await post_event(session, api_url, name if match else "unknown", score, args.camera)
+        else:
+            print(f"⚠️  {img.name:30s} → API response had no 'best' key: {resp}")
+
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        print(f"🚫 network error for {img.name}: {e}", file=sys.stderr)
+    except Exception as e:
+        print(f"⚠️  failed on {img.name}: {e}", file=sys.stderr)
+
+async def main_async(args, api_url: str, files: list[Path]):
+    # at most `concurrency` frames in flight; submission blocks once the pipeline is full
+    slots = asyncio.Semaphore(args.concurrency)
+    pending: set[asyncio.Task] = set()
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        while True:
+            batch = files.copy()
+            if args.shuffle:
+                random.shuffle(batch)
+            for img in batch:
+                await slots.acquire()
+                task = asyncio.create_task(process_image(session, api_url, img, args))
+                task.add_done_callback(lambda _t: slots.release())
+                task.add_done_callback(pending.discard)
+                pending.add(task)
+                await asyncio.sleep(args.interval)
+            if not args.loop:
+                break
+        await asyncio.gather(*pending)
+
 def main():
     p = argparse.ArgumentParser(description="Folder → /match simulator with /events logging")
     p.add_argument("--folder", default="samples", help="Folder with images (jpg/jpeg/png)")
     p.add_argument("--url", default="http://127.0.0.1:8000", help="Base URL of your API")
     p.add_argument("--camera", default="simulator-1", help="Camera ID/name to include in logs")
     p.add_argument("--thr", type=float, default=0.45, help="Cosine similarity threshold")
-    p.add_argument("--interval", type=float, default=1.0, help="Seconds between frames")
+    p.add_argument("--interval", type=float, default=1.0, help="Seconds between frame submissions")
+    p.add_argument("--concurrency", type=int, default=4, help="Max frames in flight at once")
     p.add_argument("--loop", action="store_true", help="Loop forever")
     p.add_argument("--shuffle", action="store_true", help="Shuffle order each pass")
     p.add_argument("--log", default="logs/folder_worker.csv", help="Local CSV log path")
     args = p.parse_args()
+    args.concurrency = max(1, args.concurrency)
 
     api_url = args.url.rstrip("/")
     folder = Path(args.folder)
     if not folder.exists():
         print(f"[!] Folder not found: {folder}", file=sys.stderr); sys.exit(1)
 
-    files = []
-    for ext in ("*.jpg","*.jpeg","*.png"):
-        files.extend(folder.glob(ext))
-    files = sorted(files)
+    files = list_images(folder)
     if not files:
         print(f"[!] No images found in {folder}", file=sys.stderr); sys.exit(1)
 
     print(f"▶ sending {len(files)} images from {folder} → {api_url}/match  "
-          f"(thr={args.thr}, interval={args.interval}s, camera={args.camera})")
+          f"(thr={args.thr}, interval={args.interval}s, concurrency={args.concurrency}, camera={args.camera})")
     try:
-        while True:
-            batch = files.copy()
-            if args.shuffle:
-                random.shuffle(batch)
-            for img in batch:
-                ts = time.strftime("%Y-%m-%d %H:%M:%S")
-                try:
-                    img_bytes = read_image_as_jpeg_bytes(img)
-                    resp = post_match(api_url, img_bytes, args.thr, args.camera)
-
-                    if "best" in resp:
-                        name = resp["best"]["name"]
-                        score = float(resp["best"]["score"])
-                        match = bool(resp["best"]["match"])
-                        sym = "✅" if match else "❌"
-                        print(f"{sym} {img.name:30s} → {name:12s}  score={score:.3f}  thr={args.thr}  cam={args.camera}")
-
-                        # client-side CSV log
-                        log_local(Path(args.log), {
-                            "ts": ts, "camera": args.camera, "image": img.name,
-                            "best_name": name, "best_score": f"{score:.3f}",
-                            "match": "1" if match else "0", "thr": f"{args.thr:.2f}",
-                        })
-
-                        # server-side event for ALL frames:
-                        post_event(api_url, name if match else "unknown", score, args.camera)
-                    else:
-                        print(f"⚠️  {img.name:30s} → API response had no 'best' key: {resp}")
-
-                except requests.exceptions.RequestException as e:
-                    print(f"🚫 network error for {img.name}: {e}", file=sys.stderr)
-                except Exception as e:
-                    print(f"⚠️  failed on {img.name}: {e}", file=sys.stderr)
-                time.sleep(args.interval)
-            if not args.loop:
-                break
+        asyncio.run(main_async(args, api_url, files))
     except KeyboardInterrupt:
         print("\n⏹ stopped by user")
 
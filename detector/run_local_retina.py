@@ -3,7 +3,12 @@ import sys, os, csv
 from pathlib import Path
 import cv2
 import numpy as np
-from insightface.app import FaceAnalysis
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+from detector._io import write_jpegs
+from detector._model import get_face_app
 
 IMG = Path("samples/entry.jpg")
 OUT_ANN = Path("samples/entry_retina_detected.jpg")
@@ -15,9 +20,8 @@ def main():
     print("• CWD:", os.getcwd())
     print("• IMG exists?", IMG.exists())
 
-    # initialize face analysis
-    app = FaceAnalysis(name="buffalo_l")   # <-- letter L, not number 1
-    app.prepare(ctx_id=-1)                 # CPU only
+    # initialize face analysis (buffalo_l, shared loader)
+    app = get_face_app()
     print("✅ FaceAnalysis ready")
 
     if not IMG.exists():
@@ -34,6 +38,7 @@ def main():
 
     h, w = img.shape[:2]
     embs, meta_rows = [], []
+    crop_jobs, face_embs = [], {}
 
     for i, f in enumerate(faces):
         x1, y1, x2, y2 = map(int, f.bbox)
@@ -44,28 +49,30 @@ def main():
         x1c, x2c = max(0, x1), min(w, x2)
         crop = img[y1c:y2c, x1c:x2c]
         if crop.size:
-            crop_path = OUT_DIR / f"retina_face_{i:02d}.jpg"
-            cv2.imwrite(str(crop_path), crop)
-            print("• wrote crop:", crop_path)
+            # copy: later rectangles are drawn into img while crops are still being encoded
+            crop_jobs.append((OUT_DIR / f"retina_face_{i:02d}.jpg", crop.copy()))
 
         # collect embedding
         if getattr(f, "embedding", None) is not None and f.embedding.size:
             emb = f.embedding.astype("float32")
             embs.append(emb)
-            np.save(EMB_DIR / f"emb_{i:02d}.npy", emb)
+            face_embs[f"emb_{i:02d}"] = emb
             meta_rows.append({
                 "idx": i,
                 "det_score": float(getattr(f, "det_score", 0.0))
             })
 
-    # save annotated image
-    cv2.imwrite(str(OUT_ANN), img)
+    # save crops + annotated image (encoded and written in parallel)
+    write_jpegs(crop_jobs + [(OUT_ANN, img)])
+    for crop_path, _ in crop_jobs:
+        print("• wrote crop:", crop_path)
     print("✅ wrote annotated:", OUT_ANN)
 
     # save embeddings and metadata
     if embs:
         embs = np.vstack(embs)
         np.save(EMB_DIR / "embeddings.npy", embs)
+        np.savez(EMB_DIR / "emb_faces.npz", **face_embs)  # per-face, keyed emb_<idx>
         with (EMB_DIR / "meta.csv").open("w", newline="") as fh:
             writer = csv.DictWriter(fh, fieldnames=["idx", "det_score"])
             writer.writeheader()
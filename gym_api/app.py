@@ -1,15 +1,25 @@
 # gym_api/app.py
+import os
+
+# Pin BLAS/OpenMP pools before numpy loads; ONNXRuntime gets its own budget below
+os.environ.setdefault("OMP_NUM_THREADS", "1")
 
 from fastapi import FastAPI, File, UploadFile
 from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.formparsers import MultiPartParser
 from pydantic import BaseModel
-from datetime import datetime, timezone
+from datetime import datetime
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import cv2
-import json, io, csv
+from collections import deque
+import asyncio, io, csv, logging, threading, time
+import orjson
 
-from insightface.app import FaceAnalysis
+from detector._model import get_face_app
+from gym_api.services.embeddings import detector_batches, embed_batch
+from gym_api.services.int8_gallery import Int8Gallery
 
 # ───────────────────────────────────────────────────────────────
 # FastAPI app
@@ -24,25 +34,98 @@ EVENTS: list[dict] = []
 # Debounce: one event per (person,camera) within this many seconds
 DEDUPE_WINDOW_SEC = 30
 
-# Tracks last time we logged each (person, camera)
+# Tracks last time (time.monotonic()) we logged each (person, camera)
 LAST_SEEN: dict[tuple[str, str], float] = {}
 
-# Persistence path
-EVENTS_PATH = Path("data/events.json")
+# Persistence: append-only NDJSON, one event per line
+EVENTS_PATH = Path("data/events.ndjson")
 EVENTS_PATH.parent.mkdir(parents=True, exist_ok=True)
+LEGACY_EVENTS_PATH = Path("data/events.json")
 
 def load_events():
     global EVENTS
+    EVENTS = []
+    if not EVENTS_PATH.exists() and LEGACY_EVENTS_PATH.exists():
+        # one-time migration from the old whole-file JSON log
+        try:
+            legacy = orjson.loads(LEGACY_EVENTS_PATH.read_bytes())
+        except Exception:
+            legacy = []
+        with EVENTS_PATH.open("wb") as fh:
+            for e in legacy:
+                fh.write(orjson.dumps(e) + b"\n")
     if EVENTS_PATH.exists():
+        with EVENTS_PATH.open("rb") as fh:
+            for line in fh:
+                try:
+                    EVENTS.append(orjson.loads(line))
+                except ValueError:
+                    continue  # skip a torn last line
+
+# Accepted events are queued here and appended to disk by _flusher(), off the request path
+_EVENT_QUEUE: deque[dict] = deque()
+EVENTS_FLUSH_SEC = float(os.getenv("EVENTS_FLUSH_SEC", "1.0"))
+EVENTS_FLUSH_MAX = int(os.getenv("EVENTS_FLUSH_MAX", "64"))
+# serializes file access between the flusher, /events/clear and /events/csv
+_EVENTS_LOCK = threading.Lock()
+# set by _append_event once EVENTS_FLUSH_MAX events are queued; created at startup
+_FLUSH_WAKE: asyncio.Event | None = None
+_FLUSH_LOOP: asyncio.AbstractEventLoop | None = None
+
+log = logging.getLogger(__name__)
+
+def _append_event(e: dict):
+    _EVENT_QUEUE.append(e)
+    # add_event runs on a threadpool thread, so wake the flusher via the loop
+    if len(_EVENT_QUEUE) >= EVENTS_FLUSH_MAX and _FLUSH_LOOP is not None and not _FLUSH_WAKE.is_set():
+        _FLUSH_LOOP.call_soon_threadsafe(_FLUSH_WAKE.set)
+
+# True while a failed write has left a partial line at the end of the log
+_EVENTS_TORN = False
+
+def _flush_events():
+    global _EVENTS_TORN
+    with _EVENTS_LOCK:
+        batch = []
+        while _EVENT_QUEUE:
+            batch.append(_EVENT_QUEUE.popleft())
+        if not batch:
+            return
+        lines = [orjson.dumps(e) + b"\n" for e in batch]
+        # terminate a torn line first: load_events skips it, and it can't swallow ours
+        lead = b"\n" if _EVENTS_TORN else b""
+        data = memoryview(lead + b"".join(lines))
+        done = 0
         try:
-            EVENTS = json.loads(EVENTS_PATH.read_text())
+            # the log is unbuffered, so write() reports exactly what reached the file
+            while done < len(data):
+                done += _EVENTS_FH.write(data[done:])
         except Exception:
-            EVENTS = []
-    else:
-        EVENTS = []
+            # re-queue, in order, only the events not fully written
+            n, end = 0, len(lead)
+            if done >= end:
+                for line in lines:
+                    if end + len(line) > done:
+                        break
+                    end += len(line)
+                    n += 1
+                _EVENTS_TORN = done > end
+            _EVENT_QUEUE.extendleft(reversed(batch[n:]))
+            raise
+        _EVENTS_TORN = False
 
-def save_events():
-    EVENTS_PATH.write_text(json.dumps(EVENTS, indent=2))
+async def _flusher():
+    # write every EVENTS_FLUSH_SEC, or sooner once EVENTS_FLUSH_MAX events are waiting
+    while True:
+        try:
+            await asyncio.wait_for(_FLUSH_WAKE.wait(), EVENTS_FLUSH_SEC)
+        except asyncio.TimeoutError:
+            pass
+        _FLUSH_WAKE.clear()
+        try:
+            await asyncio.to_thread(_flush_events)
+        except Exception:  # disk full, EIO: keep the events queued and retry next round
+            log.exception("writing %s failed; %d events still queued", EVENTS_PATH, len(_EVENT_QUEUE))
 
 class Event(BaseModel):
     person: str
@@ -50,41 +133,114 @@ class Event(BaseModel):
     camera: str = "simulator"
     timestamp: str | None = None
 
-def _should_log(person: str, camera: str, ts_iso: str | None = None) -> bool:
+def _should_log(person: str, camera: str, now: float | None = None) -> bool:
     """
     Return True if we should log a new event for (person, camera),
     i.e., last event is older than DEDUPE_WINDOW_SEC. Updates LAST_SEEN on allow.
+    Times are time.monotonic() seconds (arrival time, not the event's timestamp).
     """
-    now = datetime.fromisoformat(ts_iso) if ts_iso else datetime.now(timezone.utc)
+    if now is None:
+        now = time.monotonic()
     key = (person, camera)
-    last_ts = LAST_SEEN.get(key)
-    if last_ts is not None:
-        delta = (now.timestamp() - last_ts)
-        if delta < DEDUPE_WINDOW_SEC:
-            return False
-    LAST_SEEN[key] = now.timestamp()
+    last = LAST_SEEN.get(key)
+    if last is not None and now - last < DEDUPE_WINDOW_SEC:
+        return False
+    LAST_SEEN[key] = now
     return True
 
-# Load any existing events on startup
+# Load any existing events on startup, then keep the log open for appends
 load_events()
+# unbuffered: a failed write must not leave bytes behind to be written again later
+_EVENTS_FH = EVENTS_PATH.open("ab", buffering=0)
+_FLUSH_TASK: asyncio.Task | None = None
+
+@app.on_event("startup")
+async def start_event_flusher():
+    global _FLUSH_TASK, _FLUSH_WAKE, _FLUSH_LOOP
+    _FLUSH_WAKE = asyncio.Event()
+    _FLUSH_LOOP = asyncio.get_running_loop()
+    _FLUSH_TASK = asyncio.create_task(_flusher())
+
+@app.on_event("shutdown")
+async def stop_event_flusher():
+    if _FLUSH_TASK is not None:
+        _FLUSH_TASK.cancel()
+    _flush_events()
+    _EVENTS_FH.close()
 
 # ───────────────────────────────────────────────────────────────
 # Face model
 # ───────────────────────────────────────────────────────────────
-face_app = FaceAnalysis(name="buffalo_l", providers=["CPUExecutionProvider"])
-face_app.prepare(ctx_id=-1, det_size=(640, 640))
+# uvicorn worker processes share the cores; split them instead of oversubscribing
+WORKERS = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+# inference calls in flight per worker process; each gets an equal share of ORT threads
+MATCH_WORKERS = max(1, int(os.getenv("MATCH_WORKERS", "2")))
+
+DET_SIZE = (640, 640)
+face_app = get_face_app(det_size=DET_SIZE,
+                        intra_op_threads=max(1, (os.cpu_count() or 1) // (WORKERS * MATCH_WORKERS)))
+
+@app.on_event("startup")
+def warmup():
+    # first run pays for kernel selection and arena allocation; do it before real traffic
+    face_app.get(np.zeros((DET_SIZE[1], DET_SIZE[0], 3), np.uint8))
+    # a blank frame has no faces, so ArcFace never runs above; feed it a crop directly
+    face_app.models["recognition"].get_feat([np.zeros((112, 112, 3), np.uint8)])
+
+try:
+    from turbojpeg import TurboJPEG
+    _turbo = TurboJPEG()
+except Exception:  # PyTurboJPEG or the libturbojpeg shared library is missing
+    _turbo = None
+
+# Scaled decodes keep the short side at or above this many pixels (0: always full size)
+DECODE_MIN_SIDE = int(os.getenv("DECODE_MIN_SIDE", "1080"))
 
-def cosine(a: np.ndarray, b: np.ndarray) -> float:
-    a = a.astype("float32"); b = b.astype("float32")
-    an = a / (np.linalg.norm(a) + 1e-9)
-    bn = b / (np.linalg.norm(b) + 1e-9)
-    return float(np.dot(an, bn))
+def _decode_jpeg_scaled(b: bytes | bytearray) -> np.ndarray | None:
+    """
+    Decode a JPEG at the smallest libjpeg-turbo IDCT scale (1/8, 1/4, 1/2) whose
+    short side stays >= DECODE_MIN_SIDE. Only the detector input is resized to
+    DET_SIZE; ArcFace's aligned crop is cut from the decoded image, so the floor
+    keeps small faces at full resolution and only shrinks frames above it (4K).
+    """
+    try:
+        w, h, _, _ = _turbo.decode_header(b)
+        shortest = min(w, h)
+        factor = next(((1, d) for d in (8, 4, 2)
+                       if DECODE_MIN_SIDE > 0 and shortest // d >= DECODE_MIN_SIDE), None)
+        return _turbo.decode(b, scaling_factor=factor) if factor else _turbo.decode(b)
+    except OSError:
+        return None
 
-def embed_image_bytes(b: bytes) -> np.ndarray:
+# Uploads stay in RAM up to this size and spill to a temp file beyond it
+# (Starlette's default is 1 MiB, just under a typical 1080p camera JPEG)
+MultiPartParser.spool_max_size = 2 * 1024 * 1024
+UPLOAD_CHUNK = 256 * 1024
+
+def read_upload(uf: UploadFile) -> bytearray:
+    """
+    Read an upload from its spooled file in chunks. Blocking; call it from a
+    pool thread rather than awaiting uf.read() on the event loop.
+    """
+    uf.file.seek(0)
+    buf = bytearray()
+    while chunk := uf.file.read(UPLOAD_CHUNK):
+        buf += chunk
+    return buf
+
+def decode_image_bytes(b: bytes | bytearray) -> np.ndarray:
+    # EXIF-tagged JPEGs (phones) stay on cv2.imdecode, which applies the orientation tag
+    if _turbo is not None and b[:3] == b"\xff\xd8\xff" and b.find(b"Exif\x00\x00", 0, 65536) < 0:
+        img = _decode_jpeg_scaled(b)
+        if img is not None:
+            return img
     arr = np.frombuffer(b, np.uint8)
     img = cv2.imdecode(arr, cv2.IMREAD_COLOR)
     if img is None:
         raise ValueError("Cannot decode image")
+    return img
+
+def embed_image(img: np.ndarray) -> np.ndarray:
     faces = face_app.get(img)
     if not faces:
         raise ValueError("No face detected")
@@ -95,19 +251,180 @@ def embed_image_bytes(b: bytes) -> np.ndarray:
     f_big = max(faces, key=area)
     return f_big.embedding.astype("float32")
 
+def embed_image_bytes(b: bytes | bytearray) -> np.ndarray:
+    return embed_image(decode_image_bytes(b))
+
+# cv2.imdecode releases the GIL, so batch uploads decode in parallel
+_DECODE_POOL = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1))
+# face_app.get / embed_batch block for 50-200 ms in ONNXRuntime; keep them off the event loop
+_POOL = ThreadPoolExecutor(max_workers=MATCH_WORKERS)
+
+# /match frames arriving within this window share one detector/recognizer pass
+MATCH_COALESCE_MS = float(os.getenv("MATCH_COALESCE_MS", "10"))
+# Only worth it when the detector takes a batch: with a fixed batch of 1
+# (buffalo_l's det_10g) the frames would be detected serially on one pool
+# thread, while direct calls run in parallel across _POOL.
+COALESCE_MATCHES = MATCH_COALESCE_MS > 0 and detector_batches(face_app.det_model)
+
+class _MatchCoalescer:
+    """Collects single-frame /match requests and embeds them with embed_batch()."""
+
+    def __init__(self, window_s: float):
+        self.window_s = window_s
+        self.pending: list[tuple[np.ndarray, asyncio.Future]] = []
+        self._flushing: set[asyncio.Task] = set()
+
+    async def embed(self, img: np.ndarray) -> np.ndarray:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self.pending.append((img, fut))
+        if len(self.pending) == 1:
+            loop.call_later(self.window_s, self._start_flush)
+        return await fut
+
+    def _start_flush(self):
+        task = asyncio.get_running_loop().create_task(self._flush())
+        self._flushing.add(task)
+        task.add_done_callback(self._flushing.discard)
+
+    async def _flush(self):
+        batch, self.pending = self.pending, []
+        loop = asyncio.get_running_loop()
+        try:
+            embs = await loop.run_in_executor(_POOL, embed_batch, face_app, [img for img, _ in batch])
+        except Exception as e:
+            embs, err = [None] * len(batch), e
+        else:
+            err = ValueError("No face detected")
+        for (_, fut), emb in zip(batch, embs):
+            if fut.done():  # client went away
+                continue
+            if emb is None:
+                fut.set_exception(err)
+            else:
+                fut.set_result(emb)
+
+_coalescer = _MatchCoalescer(MATCH_COALESCE_MS / 1000.0)
+
 # ───────────────────────────────────────────────────────────────
 # Gallery storage (JSON file)
 # ───────────────────────────────────────────────────────────────
 GALLERY_PATH = Path("data/embeddings/gallery.json")
 GALLERY_PATH.parent.mkdir(parents=True, exist_ok=True)
+# Binary copy of the gallery: (N,512) float32 with unit rows, plus the row names
+GALLERY_NPY = GALLERY_PATH.with_suffix(".npy")
+GALLERY_NAMES = GALLERY_PATH.with_name("gallery_names.json")
+
+def _stamp(st: os.stat_result) -> list[int]:
+    # identifies one version of gallery.json; mtime alone can't tell two writers apart
+    return [st.st_mtime_ns, st.st_size]
+
+def _read_gallery_json() -> tuple[dict[str, list[float]], list[int] | None]:
+    # parse and stamp through the same fd, so the stamp describes exactly these bytes
+    try:
+        with GALLERY_PATH.open("rb") as fh:
+            return orjson.loads(fh.read()), _stamp(os.fstat(fh.fileno()))
+    except FileNotFoundError:
+        return {}, None
 
 def read_gallery() -> dict[str, list[float]]:
-    if not GALLERY_PATH.exists():
-        return {}
-    return json.loads(GALLERY_PATH.read_text())
+    return _read_gallery_json()[0]
+
+def _gallery_matrix(d: dict) -> tuple[list[str], np.ndarray | None]:
+    names = list(d.keys())
+    if not names:
+        return [], None
+    G = np.asarray(list(d.values()), dtype=np.float32)
+    G /= np.linalg.norm(G, axis=1, keepdims=True) + 1e-9
+    return names, G
+
+def _tmp_path(path: Path) -> Path:
+    # per process and thread, so concurrent writers never rename each other's temp file
+    return path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+def _save_gallery_matrix(names: list[str], G: np.ndarray | None, source: list[int] | None):
+    if G is None:
+        GALLERY_NPY.unlink(missing_ok=True)
+        GALLERY_NAMES.unlink(missing_ok=True)
+        return
+    # write-then-rename so another worker never maps a half-written file
+    tmp = _tmp_path(GALLERY_NPY)
+    with tmp.open("wb") as fh:
+        np.save(fh, G)
+    tmp.replace(GALLERY_NPY)
+    # the sidecar records which gallery.json version the matrix came from and
+    # which .npy (by inode) holds it; readers reject any pair that doesn't line up
+    meta = {"source": source, "npy_ino": GALLERY_NPY.stat().st_ino, "names": names}
+    tmp = _tmp_path(GALLERY_NAMES)
+    tmp.write_bytes(orjson.dumps(meta))
+    tmp.replace(GALLERY_NAMES)
 
 def write_gallery(d: dict):
-    GALLERY_PATH.write_text(json.dumps(d, indent=2))
+    tmp = _tmp_path(GALLERY_PATH)
+    with tmp.open("wb") as fh:
+        # OPT_SERIALIZE_NUMPY: embeddings can be stored as float32 arrays, no .tolist()
+        fh.write(orjson.dumps(d, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+        fh.flush()
+        source = _stamp(os.fstat(fh.fileno()))  # the rename keeps mtime and size
+    tmp.replace(GALLERY_PATH)
+    _save_gallery_matrix(*_gallery_matrix(d), source)
+    # force the next read_gallery_matrix() to reload
+    _GAL_CACHE["stamp"] = None
+
+# GALLERY_INT8=1 scores against an int8 copy of the gallery (per-row scale);
+# a quarter of the bytes per query at a small cost in score precision
+GALLERY_INT8 = os.getenv("GALLERY_INT8", "0") == "1"
+
+# Process-global cache: names + (N,512) float32 matrix with L2-normalized rows
+_GAL_CACHE: dict = {"stamp": None, "names": [], "G": None}
+# read_gallery_matrix() runs on pool threads; one reload at a time per process
+_GAL_LOCK = threading.Lock()
+
+def _load_gallery_npy(source: list[int]) -> tuple[list[str], np.ndarray] | None:
+    # only trust the .npy if its sidecar was built from this exact gallery.json
+    try:
+        meta = orjson.loads(GALLERY_NAMES.read_bytes())
+        ino = meta["npy_ino"]
+        if meta["source"] != source or GALLERY_NPY.stat().st_ino != ino:
+            return None
+        G = np.load(GALLERY_NPY, mmap_mode="r")
+        if GALLERY_NPY.stat().st_ino != ino:
+            return None  # replaced while we were mapping it
+        names = meta["names"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    if G.ndim != 2 or G.shape[0] != len(names) or G.dtype != np.float32:
+        return None
+    return names, G
+
+def read_gallery_matrix() -> tuple[list[str], np.ndarray | Int8Gallery | None]:
+    """
+    Return (names, G) where G[i] is the unit-norm embedding of names[i].
+    Reloaded only when gallery.json's mtime or size changes; served from the
+    memory-mapped .npy when it was built from that exact file, rebuilt from
+    JSON otherwise. Does file I/O, so call it off the event loop.
+    """
+    try:
+        stamp = _stamp(GALLERY_PATH.stat())
+    except FileNotFoundError:
+        _GAL_CACHE.update(stamp=None, names=[], G=None)
+        return [], None
+    with _GAL_LOCK:
+        if stamp != _GAL_CACHE["stamp"]:
+            loaded = _load_gallery_npy(stamp)
+            if loaded is None:
+                d, stamp = _read_gallery_json()
+                names, G = _gallery_matrix(d)
+                try:
+                    _save_gallery_matrix(names, G, stamp)
+                except OSError as e:  # e.g. data/ mounted read-only on an API replica
+                    log.warning("could not save %s (%s); serving the gallery from memory", GALLERY_NPY, e)
+            else:
+                names, G = loaded
+            if GALLERY_INT8 and G is not None:
+                G = Int8Gallery(np.asarray(G))
+            _GAL_CACHE.update(stamp=stamp, names=names, G=G)
+        return _GAL_CACHE["names"], _GAL_CACHE["G"]
 
 # ───────────────────────────────────────────────────────────────
 # Routes
@@ -123,54 +440,93 @@ async def enroll(name: str = "", files: list[UploadFile] = File(...)):
             {"detail":[{"type":"missing","loc":["body","name"],"msg":"Field required","input":None}]},
             status_code=422
         )
-    gal = read_gallery()
+    loop = asyncio.get_running_loop()
     embs = []
     for uf in files:
-        b = await uf.read()
-        embs.append(embed_image_bytes(b))
+        embs.append(await loop.run_in_executor(_POOL, lambda uf=uf: embed_image_bytes(read_upload(uf))))
+    gal = read_gallery()
     if not embs:
         return JSONResponse({"error":"no usable images"}, status_code=400)
     avg = np.mean(np.stack(embs, axis=0), axis=0).astype("float32")
-    gal[name] = avg.tolist()
+    gal[name] = avg
     write_gallery(gal)
     return {"enrolled": name, "images": len(embs), "people": list(gal.keys())}
 
-@app.post("/match")
-async def match(file: UploadFile = File(...), thr: float = 0.45, camera: str = "simulator"):
-    gal = read_gallery()
-    if not gal:
-        return JSONResponse({"error":"gallery empty, enroll first"}, status_code=400)
-    b = await file.read()
-    try:
-        q = embed_image_bytes(b)
-    except Exception as e:
-        return JSONResponse({"error": str(e)}, status_code=400)
-
-    scores = {name: cosine(np.array(vec, dtype="float32"), q) for name, vec in gal.items()}
-    best_name = max(scores, key=scores.get)
-    best_score = scores[best_name]
+def _match_result(names: list[str], G: np.ndarray | Int8Gallery, q: np.ndarray, thr: float, camera: str,
+                  return_scores: bool = False) -> dict:
+    qn = q / (np.linalg.norm(q) + 1e-9)
+    scores_vec = G @ qn
+    idx = int(scores_vec.argmax())
+    best_name = names[idx]
+    best_score = float(scores_vec[idx])
     is_match = best_score >= thr
 
     # Debounced auto-log for matches (with persistence)
     logged = False
     if is_match:
-        ts_iso = datetime.utcnow().isoformat()
-        if _should_log(best_name, camera, ts_iso=ts_iso):
-            EVENTS.append({
+        if _should_log(best_name, camera):
+            ts_iso = datetime.utcnow().isoformat()
+            e = {
                 "person": best_name,
                 "score": round(best_score, 3),
                 "camera": camera,
                 "timestamp": ts_iso
-            })
-            save_events()
+            }
+            EVENTS.append(e)
+            _append_event(e)
             logged = True
 
-    return {
-        "scores": {k: round(v,3) for k,v in scores.items()},
+    result = {
         "best": {"name": best_name, "score": round(best_score,3), "match": is_match},
         "thr": thr,
         "logged": logged
     }
+    # the per-name breakdown costs N float roundings + a dict; only build it on request
+    if return_scores:
+        result["scores"] = {k: round(v,3) for k,v in zip(names, scores_vec.tolist())}
+    return result
+
+@app.post("/match")
+async def match(file: UploadFile = File(...), thr: float = 0.45, camera: str = "simulator",
+                return_scores: bool = False):
+    loop = asyncio.get_running_loop()
+    names, G = await loop.run_in_executor(_DECODE_POOL, read_gallery_matrix)
+    if not names:
+        return JSONResponse({"error":"gallery empty, enroll first"}, status_code=400)
+    try:
+        img = await loop.run_in_executor(_DECODE_POOL, lambda: decode_image_bytes(read_upload(file)))
+        if COALESCE_MATCHES:
+            q = await _coalescer.embed(img)
+        else:
+            q = await loop.run_in_executor(_POOL, embed_image, img)
+    except ValueError as e:  # undecodable image / no face: the client's problem
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except Exception as e:  # inference failure: ours
+        return JSONResponse({"error": str(e)}, status_code=500)
+    return _match_result(names, G, q, thr, camera, return_scores)
+
+@app.post("/match_batch")
+async def match_batch(files: list[UploadFile] = File(...), thr: float = 0.45, camera: str = "simulator",
+                      return_scores: bool = False):
+    loop = asyncio.get_running_loop()
+    names, G = await loop.run_in_executor(_DECODE_POOL, read_gallery_matrix)
+    if not names:
+        return JSONResponse({"error":"gallery empty, enroll first"}, status_code=400)
+
+    def try_decode(uf: UploadFile):
+        try:
+            return decode_image_bytes(read_upload(uf))
+        except ValueError:
+            return None
+
+    imgs = await asyncio.gather(*(loop.run_in_executor(_DECODE_POOL, try_decode, uf) for uf in files))
+    ok = [i for i, img in enumerate(imgs) if img is not None]
+    embs = await loop.run_in_executor(_POOL, embed_batch, face_app, [imgs[i] for i in ok]) if ok else []
+
+    results: list[dict] = [{"error": "Cannot decode image"} for _ in files]
+    for i, q in zip(ok, embs):
+        results[i] = {"error": "No face detected"} if q is None else _match_result(names, G, q, thr, camera, return_scores)
+    return {"results": results}
 
 @app.get("/events")
 def list_events():
@@ -179,42 +535,56 @@ def list_events():
 
 @app.post("/events")
 def add_event(ev: Event):
-    ts = ev.timestamp or datetime.utcnow().isoformat()
-    if _should_log(ev.person, ev.camera, ts_iso=ts):
-        EVENTS.append({
+    if _should_log(ev.person, ev.camera):
+        ts = ev.timestamp or datetime.utcnow().isoformat()
+        e = {
             "person": ev.person,
             "score": round(float(ev.score), 3),
             "camera": ev.camera,
             "timestamp": ts
-        })
-        save_events()
+        }
+        EVENTS.append(e)
+        _append_event(e)
         return {"status": "logged", "count": len(EVENTS)}
     else:
         return {"status": "skipped_duplicate", "count": len(EVENTS)}
 
 @app.post("/events/clear")
 def clear_events():
-    global EVENTS
+    global EVENTS, _EVENTS_TORN
     EVENTS = []
-    save_events()
+    with _EVENTS_LOCK:
+        _EVENT_QUEUE.clear()
+        _EVENTS_FH.truncate(0)
+        _EVENTS_TORN = False
     return {"status": "cleared"}
 
+# rows are yielded in chunks of about this many bytes; Starlette hops to a
+# worker thread for every item of a sync generator, so one row per yield is slow
+CSV_CHUNK_BYTES = 64 * 1024
+
 @app.get("/events/csv")
 def events_csv():
-    # stream a CSV from current EVENTS
-    output = io.StringIO()
-    writer = csv.DictWriter(output, fieldnames=["timestamp","camera","person","score"])
-    writer.writeheader()
-    for e in EVENTS:
-        writer.writerow({
-            "timestamp": e.get("timestamp",""),
-            "camera": e.get("camera",""),
-            "person": e.get("person",""),
-            "score": e.get("score",""),
-        })
-    output.seek(0)
+    # stream a CSV straight from the NDJSON log; memory is bounded by one chunk
+    fields = ["timestamp","camera","person","score"]
+    _flush_events()  # include events still waiting in the queue
+    def rows():
+        buf = io.StringIO()
+        writer = csv.DictWriter(buf, fieldnames=fields)
+        writer.writeheader()
+        with EVENTS_PATH.open("rb") as fh:
+            for line in fh:
+                try:
+                    e = orjson.loads(line)
+                except ValueError:
+                    continue
+                writer.writerow({k: e.get(k, "") for k in fields})
+                if buf.tell() >= CSV_CHUNK_BYTES:
+                    yield buf.getvalue()
+                    buf.seek(0); buf.truncate()
+        yield buf.getvalue()
     return StreamingResponse(
-        iter([output.getvalue()]),
+        rows(),
         media_type="text/csv",
         headers={"Content-Disposition": "attachment; filename=events.csv"}
-    )
\ No newline at end of file
+    )
@@ -0,0 +1,114 @@
+# gym_api/services/embeddings.py
+#
+# Batched RetinaFace + ArcFace (one detector forward for B frames when the
+# graph allows it, one recognizer forward for all aligned faces).
+import cv2
+import numpy as np
+from insightface.app import FaceAnalysis
+from insightface.model_zoo.retinaface import distance2bbox, distance2kps
+from insightface.utils import face_align
+
+def _letterbox(img: np.ndarray, size: tuple[int, int]) -> tuple[np.ndarray, float]:
+    # same resize + top-left padding RetinaFace.detect applies to a single frame
+    w, h = size
+    im_ratio = img.shape[0] / img.shape[1]
+    if im_ratio > h / w:
+        new_h = h
+        new_w = int(new_h / im_ratio)
+    else:
+        new_w = w
+        new_h = int(new_w * im_ratio)
+    scale = new_h / img.shape[0]
+    canvas = np.zeros((h, w, 3), dtype=np.uint8)
+    canvas[:new_h, :new_w] = cv2.resize(img, (new_w, new_h))
+    return canvas, scale
+
+def _anchor_centers(det, height: int, width: int, stride: int) -> np.ndarray:
+    key = (height, width, stride)
+    centers = det.center_cache.get(key)
+    if centers is None:
+        centers = np.stack(np.mgrid[:height, :width][::-1], axis=-1).astype(np.float32)
+        centers = (centers * stride).reshape((-1, 2))
+        if det._num_anchors > 1:
+            centers = np.stack([centers] * det._num_anchors, axis=1).reshape((-1, 2))
+        if len(det.center_cache) < 100:
+            det.center_cache[key] = centers
+    return centers
+
+def _largest_face_kps(det, outs: list[np.ndarray], b: int, scale: float) -> np.ndarray | None:
+    """
+    Decode anchors + NMS for batch item b (mirrors RetinaFace.forward/detect)
+    and return the 5-point landmarks of the largest face, or None.
+    """
+    in_w, in_h = det.input_size
+    fmc = det.fmc
+    scores_l, bboxes_l, kpss_l = [], [], []
+    for idx, stride in enumerate(det._feat_stride_fpn):
+        scores = outs[idx][b]
+        centers = _anchor_centers(det, in_h // stride, in_w // stride, stride)
+        pos = np.where(scores >= det.det_thresh)[0]
+        scores_l.append(scores[pos])
+        bboxes_l.append(distance2bbox(centers, outs[idx + fmc][b] * stride)[pos])
+        kps = distance2kps(centers, outs[idx + fmc * 2][b] * stride)
+        kpss_l.append(kps.reshape((kps.shape[0], -1, 2))[pos])
+
+    scores = np.vstack(scores_l)
+    if scores.size == 0:
+        return None
+    order = scores.ravel().argsort()[::-1]
+    pre_det = np.hstack((np.vstack(bboxes_l) / scale, scores)).astype(np.float32, copy=False)[order]
+    keep = det.nms(pre_det)
+    dets = pre_det[keep]
+    kpss = (np.vstack(kpss_l) / scale)[order][keep]
+    areas = (dets[:, 2] - dets[:, 0]).clip(0) * (dets[:, 3] - dets[:, 1]).clip(0)
+    return kpss[int(areas.argmax())]
+
+def detector_batches(det) -> bool:
+    # buffalo_l's det_10g is exported with a fixed batch of 1 (input.1: [1,3,?,?])
+    return not isinstance(det.session.get_inputs()[0].shape[0], int)
+
+def _largest_face_kps_single(det, img: np.ndarray) -> np.ndarray | None:
+    # one detector forward through insightface's own decode, for static-batch exports
+    bboxes, kpss = det.detect(img, max_num=0, metric="default")
+    if bboxes.shape[0] == 0:
+        return None
+    areas = (bboxes[:, 2] - bboxes[:, 0]).clip(0) * (bboxes[:, 3] - bboxes[:, 1]).clip(0)
+    return kpss[int(areas.argmax())]
+
+def _detect_chunk(det, chunk: list[np.ndarray]) -> list[np.ndarray | None]:
+    if len(chunk) == 1 or not detector_batches(det):
+        return [_largest_face_kps_single(det, img) for img in chunk]
+    boxed = [_letterbox(img, det.input_size) for img in chunk]
+    blob = cv2.dnn.blobFromImages(
+        [canvas for canvas, _ in boxed], 1.0 / det.input_std, det.input_size,
+        (det.input_mean, det.input_mean, det.input_mean), swapRB=True,
+    )
+    net_outs = det.session.run(det.output_names, {det.input_name: blob})
+    # some exports flatten batch into the anchor axis, others keep it. Either way:
+    outs = [o.reshape(len(chunk), -1, o.shape[-1]) for o in net_outs]
+    return [_largest_face_kps(det, outs, b, scale) for b, (_, scale) in enumerate(boxed)]
+
+def embed_batch(face_app: FaceAnalysis, imgs: list[np.ndarray], max_batch: int = 16) -> list[np.ndarray | None]:
+    """
+    Embed the largest face of each BGR image. Returns one float32 (512,) vector
+    per image, or None where no face was found. The detector runs batched only
+    when its graph has a dynamic batch axis; ArcFace always gets one batch.
+    """
+    det = face_app.det_model
+    rec = face_app.models["recognition"]
+    if not det.use_kps:
+        raise RuntimeError("batched matching needs a detector with keypoints")
+
+    out: list[np.ndarray | None] = [None] * len(imgs)
+    for start in range(0, len(imgs), max_batch):
+        chunk = imgs[start:start + max_batch]
+        crops, owners = [], []
+        for b, (img, kps) in enumerate(zip(chunk, _detect_chunk(det, chunk))):
+            if kps is not None:
+                crops.append(face_align.norm_crop(img, landmark=kps, image_size=rec.input_size[0]))
+                owners.append(start + b)
+        if crops:
+            feats = rec.get_feat(crops)
+            for i, f in zip(owners, feats):
+                out[i] = f.astype("float32")
+    return out
@@ -0,0 +1,45 @@
+# gym_api/services/int8_gallery.py
+#
+# int8 gallery scoring on ONNXRuntime; kept apart from embeddings.py so it
+# loads without insightface.
+import numpy as np
+import onnxruntime as ort
+from onnx import TensorProto, helper
+
+class Int8Gallery:
+    """
+    Unit-row gallery quantized to int8 with a per-row scale. `G @ qn` returns
+    float32 cosine scores like the float matrix, but the matvec runs as
+    ONNXRuntime MatMulInteger (int8 x int8 -> int32, VNNI-backed in MLAS).
+    """
+
+    _session = None
+
+    def __init__(self, G: np.ndarray):
+        self.scale = (np.abs(G).max(axis=1) / 127.0 + 1e-12).astype(np.float32)
+        # stored transposed: MatMulInteger computes (1,D) @ (D,N)
+        self.GqT = np.ascontiguousarray(np.round(G / self.scale[:, None]).astype(np.int8).T)
+        self.shape = G.shape
+
+    @classmethod
+    def _matvec(cls):
+        if cls._session is None:
+            graph = helper.make_graph(
+                [helper.make_node("MatMulInteger", ["q", "G"], ["s"])], "int8_matvec",
+                [helper.make_tensor_value_info("q", TensorProto.INT8, [1, "D"]),
+                 helper.make_tensor_value_info("G", TensorProto.INT8, ["D", "N"])],
+                [helper.make_tensor_value_info("s", TensorProto.INT32, [1, "N"])],
+            )
+            model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+            model.ir_version = 8
+            opts = ort.SessionOptions()
+            opts.intra_op_num_threads = 1
+            cls._session = ort.InferenceSession(model.SerializeToString(), opts,
+                                                providers=["CPUExecutionProvider"])
+        return cls._session
+
+    def __matmul__(self, qn: np.ndarray) -> np.ndarray:
+        q_scale = float(np.abs(qn).max()) / 127.0 + 1e-12
+        q = np.round(qn / q_scale).astype(np.int8).reshape(1, -1)
+        (s,) = self._matvec().run(None, {"q": q, "G": self.GqT})
+        return s[0].astype(np.float32) * (self.scale * q_scale)
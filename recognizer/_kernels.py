@@ -0,0 +1,13 @@
+# recognizer/_kernels.py
+import math
+from numba import njit
+
+@njit(fastmath=True, cache=True)
+def cosine_sim(a, b):
+    """Cosine similarity of two 1-D vectors in a single fused pass (no normalized copies)."""
+    s = 0.0; aa = 0.0; bb = 0.0
+    for i in range(a.shape[0]):
+        s += a[i] * b[i]
+        aa += a[i] * a[i]
+        bb += b[i] * b[i]
+    return s / (math.sqrt(aa) * math.sqrt(bb) + 1e-9)
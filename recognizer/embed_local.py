@@ -1,8 +1,14 @@
-import csv
+import csv, sys
 from pathlib import Path
 import cv2
 import numpy as np
-from insightface.app import FaceAnalysis
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+from detector._io import write_jpegs
+from detector._model import get_face_app
+from recognizer._kernels import cosine_sim
 
 # ------ Paths ------
 IMG = Path("samples/entry.jpg")  # Put a test image here
@@ -11,14 +17,11 @@ OUT_DIR = Path("data/faces")                 # face crops
 EMB_DIR = Path("data/embeddings")            # embeddings + metadata
 
 def cosine(a: np.ndarray, b: np.ndarray) -> float:
-    a = a / (np.linalg.norm(a) + 1e-9)
-    b = b / (np.linalg.norm(b) + 1e-9)
-    return float(np.dot(a, b))
+    return float(cosine_sim(a, b))
 
 def main():
     # Load RetinaFace + ArcFace (downloads on first run to ~/.insightface)
-    app = FaceAnalysis(name="buffalo_l")   # <-- letter L (large model pack)
-    app.prepare(ctx_id=-1)                 # CPU only (Mac/Windows/Linux)
+    app = get_face_app()
 
     # Read input image
     if not IMG.exists():
@@ -39,6 +42,7 @@ def main():
     h, w = img.shape[:2]
     embs = []
     meta_rows = []
+    crop_jobs, face_embs = [], {}
     for i, f in enumerate(faces):
         x1, y1, x2, y2 = map(int, f.bbox)
 
@@ -52,29 +56,30 @@ def main():
         x1c, x2c = max(0, x1), min(w, x2)
         crop = img[y1c:y2c, x1c:x2c]
         if crop.size:
-            crop_path = OUT_DIR / f"retina_face_{i:02d}.jpg"
-            cv2.imwrite(str(crop_path), crop)
+            # copy: later boxes/labels are drawn into img while crops are still being encoded
+            crop_jobs.append((OUT_DIR / f"retina_face_{i:02d}.jpg", crop.copy()))
 
         # collect embedding (512-D)
         if getattr(f, "embedding", None) is not None and f.embedding.size:
             emb = f.embedding.astype("float32")
             embs.append(emb)
-            # also save per-face embedding if you want
-            np.save(EMB_DIR / f"emb_{i:02d}.npy", emb)
+            # also keep per-face embedding (saved together as one .npz below)
+            face_embs[f"emb_{i:02d}"] = emb
             meta_rows.append({
                 "idx": i,
                 "det_score": float(f.det_score),
                 "x1": x1, "y1": y1, "x2": x2, "y2": y2
             })
 
-    # Save annotated image
-    cv2.imwrite(str(OUT_ANN), img)
+    # Save crops + annotated image (encoded and written in parallel)
+    write_jpegs(crop_jobs + [(OUT_ANN, img)])
     print(f"Saved annotated image -> {OUT_ANN}")
 
     # Save stacked embeddings + metadata
     if embs:
         embs = np.vstack(embs)  # (N, 512)
         np.save(EMB_DIR / "embeddings.npy", embs)
+        np.savez(EMB_DIR / "emb_faces.npz", **face_embs)
         with (EMB_DIR / "meta.csv").open("w", newline="") as fh:
             wcsv = csv.DictWriter(fh, fieldnames=["idx", "det_score", "x1", "y1", "x2", "y2"])
             wcsv.writeheader()
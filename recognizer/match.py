@@ -1,41 +1,86 @@
 # recognizer/match.py
-import argparse, json, numpy as np, cv2
+from __future__ import annotations
+
+import argparse, json, os, socket, sys
 from pathlib import Path
-from insightface.app import FaceAnalysis
+from typing import TYPE_CHECKING
 
-DB = Path("data/embeddings/gallery.json")
+# numpy/cv2/insightface load lazily: a query answered by match_server.py needs none of them
+if TYPE_CHECKING:
+    import numpy as np
+    from insightface.app import FaceAnalysis
 
-def norm(v: np.ndarray) -> np.ndarray:
-    v = v.astype("float32"); return v / (np.linalg.norm(v) + 1e-9)
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
 
-def cosine(a: np.ndarray, b: np.ndarray) -> float:
-    return float(np.dot(norm(a), norm(b)))
+DB = Path("data/embeddings/gallery.json")
+# match_server.py listens here; without it, match.py loads the model itself
+SOCKET_PATH = os.getenv("MATCH_SOCKET", "/tmp/gym_match.sock")
 
 def embed(app: FaceAnalysis, img_path: Path) -> np.ndarray:
+    import cv2
     img = cv2.imread(str(img_path))
-    if img is None: raise SystemExit(f"Cannot read {img_path}")
+    if img is None: raise ValueError(f"Cannot read {img_path}")
     faces = app.get(img)
-    if not faces: raise SystemExit(f"No face in {img_path}")
+    if not faces: raise ValueError(f"No face in {img_path}")
     return faces[0].embedding.astype("float32")
 
+def load_gallery() -> tuple[list[str], np.ndarray]:
+    import numpy as np
+    if not DB.exists(): raise ValueError(f"Missing {DB}. Enroll first.")
+    gallery = json.loads(DB.read_text())
+    if not gallery: raise ValueError("Empty gallery. Enroll at least one person.")
+    names = list(gallery.keys())
+    G = np.asarray(list(gallery.values()), dtype=np.float32)  # (N, 512)
+    G /= np.linalg.norm(G, axis=1, keepdims=True) + 1e-9
+    return names, G
+
+def match_image(app: FaceAnalysis, names: list[str], G: np.ndarray, img_path: Path) -> dict:
+    import numpy as np
+    q = embed(app, img_path)
+    qn = q / (np.linalg.norm(q) + 1e-9)
+    s = G @ qn
+    best_i = int(s.argmax())
+    return {"scores": dict(zip(names, s.tolist())), "best": names[best_i], "score": float(s[best_i])}
+
+def query_server(img_path: Path, sock_path: str = SOCKET_PATH) -> dict | None:
+    """Ask a running match_server.py; None if there is none to ask."""
+    if not hasattr(socket, "AF_UNIX") or not os.path.exists(sock_path):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.connect(sock_path)
+            with s.makefile("rwb") as fh:
+                fh.write(json.dumps({"image": str(img_path.resolve())}).encode() + b"\n")
+                fh.flush()
+                line = fh.readline()
+    except OSError:
+        return None  # stale socket file
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None  # server died mid-request; answer locally
+
 def main():
     p = argparse.ArgumentParser()
     p.add_argument("image", help="query image path (e.g. samples/entry2.jpg)")
     p.add_argument("--thr", type=float, default=0.45, help="cosine threshold for match")
     args = p.parse_args()
 
-    if not DB.exists(): raise SystemExit(f"Missing {DB}. Enroll first.")
-    gallery = json.loads(DB.read_text())
-    if not gallery: raise SystemExit("Empty gallery. Enroll at least one person.")
-
-    app = FaceAnalysis(name="buffalo_l"); app.prepare(ctx_id=-1)
-    q = embed(app, Path(args.image))
+    res = query_server(Path(args.image))
+    if res is None:
+        from detector._model import get_face_app
+        try:
+            names, G = load_gallery()
+            res = match_image(get_face_app(), names, G, Path(args.image))
+        except ValueError as e:
+            raise SystemExit(str(e))
+    if "error" in res: raise SystemExit(res["error"])
 
-    scores = {name: cosine(np.array(vec, dtype="float32"), q) for name, vec in gallery.items()}
-    best = max(scores, key=scores.get)
-    print("scores:", {k: round(v,3) for k,v in scores.items()})
-    print(f"best: {best} ({scores[best]:.3f})")
-    print("match?", "YES" if scores[best] >= args.thr else "NO", f"(thr={args.thr})")
+    print("scores:", {k: round(v,3) for k,v in res["scores"].items()})
+    print(f"best: {res['best']} ({res['score']:.3f})")
+    print("match?", "YES" if res["score"] >= args.thr else "NO", f"(thr={args.thr})")
 
 if __name__ in ("__main__", "<run_path>"):
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,54 @@
+# recognizer/match_server.py
+# Keeps buffalo_l loaded and answers match.py over a unix socket, so repeated
+# CLI matches skip the multi-second model load.
+#   one request per connection: {"image": "/abs/path.jpg"}\n -> match_image() result or {"error": ...}\n
+import argparse, json, os, socket, sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+from detector._model import get_face_app
+from recognizer.match import DB, SOCKET_PATH, load_gallery, match_image
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--socket", default=SOCKET_PATH, help="unix socket path to listen on")
+    args = p.parse_args()
+
+    app = get_face_app()
+    gallery = {"mtime": None, "names": [], "G": None}
+
+    def current_gallery():
+        # reload only when gallery.json changes
+        mtime = DB.stat().st_mtime_ns if DB.exists() else None
+        if mtime is None or mtime != gallery["mtime"]:
+            names, G = load_gallery()
+            gallery.update(mtime=mtime, names=names, G=G)
+        return gallery["names"], gallery["G"]
+
+    if os.path.exists(args.socket):
+        os.unlink(args.socket)
+    srv = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    srv.bind(args.socket)
+    srv.listen()
+    print(f"▶ match server ready on {args.socket}")
+    try:
+        while True:
+            conn, _ = srv.accept()
+            with conn, conn.makefile("rwb") as fh:
+                try:
+                    req = json.loads(fh.readline())
+                    resp = match_image(app, *current_gallery(), Path(req["image"]))
+                except Exception as e:
+                    resp = {"error": str(e)}
+                fh.write(json.dumps(resp).encode() + b"\n")
+                fh.flush()
+    except KeyboardInterrupt:
+        print("\n⏹ stopped by user")
+    finally:
+        srv.close()
+        os.unlink(args.socket)
+
+if __name__ in ("__main__", "<run_path>"):
+    main()
@@ -1,15 +1,20 @@
+import sys
 import numpy as np, cv2
 from pathlib import Path
 from insightface.app import FaceAnalysis
 
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+from detector._model import get_face_app
+from recognizer._kernels import cosine_sim
+
 # Two images to compare (put real face photos here)
 IMG1 = Path("samples/entry.jpg")
 IMG2 = Path("samples/entry2.jpg")
 
 def cosine(a: np.ndarray, b: np.ndarray) -> float:
-    a = a / (np.linalg.norm(a) + 1e-9)
-    b = b / (np.linalg.norm(b) + 1e-9)
-    return float(np.dot(a, b))
+    return float(cosine_sim(a, b))
 
 def embed(app: FaceAnalysis, p: Path) -> np.ndarray:
     if not p.exists():
@@ -23,9 +28,8 @@ def embed(app: FaceAnalysis, p: Path) -> np.ndarray:
     return faces[0].embedding.astype("float32")
 
 def main():
-    # Load RetinaFace + ArcFace on CPU
-    app = FaceAnalysis(name="buffalo_l")
-    app.prepare(ctx_id=-1)
+    # Load RetinaFace + ArcFace
+    app = get_face_app()
 
     e1 = embed(app, IMG1)
     e2 = embed(app, IMG2)
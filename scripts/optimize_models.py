@@ -0,0 +1,37 @@
+# scripts/optimize_models.py
+# One-time: run ONNXRuntime's graph optimizer (constant folding, Conv+BN/activation
+# fusion, ...) over the buffalo_l pack and save the results, so sessions start from
+# an already-optimized graph. detector/_model.py loads them automatically.
+import argparse, sys
+from pathlib import Path
+import onnxruntime as ort
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+from detector._model import OPTIMIZED_SUBDIR
+
+def main():
+    p = argparse.ArgumentParser(description="Pre-optimize insightface ONNX models")
+    p.add_argument("--model-dir", default="~/.insightface/models/buffalo_l",
+                   help="model pack directory (downloaded on first FaceAnalysis run)")
+    args = p.parse_args()
+
+    src_dir = Path(args.model_dir).expanduser()
+    models = sorted(src_dir.glob("*.onnx"))
+    if not models:
+        raise SystemExit(f"No .onnx models in {src_dir}. Run the API or a script once to download them.")
+    out_dir = src_dir / OPTIMIZED_SUBDIR  # subdir: FaceAnalysis only globs the top level
+    out_dir.mkdir(exist_ok=True)
+
+    for src in models:
+        opts = ort.SessionOptions()
+        # EXTENDED, not ALL: ALL also bakes in NCHWc layout transforms tied to this
+        # CPU's vector width; those are cheap to redo at load time anyway
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+        opts.optimized_model_filepath = str(out_dir / src.name)
+        ort.InferenceSession(str(src), opts, providers=["CPUExecutionProvider"])
+        print(f"✅ {src.name} → {out_dir / src.name}")
+
+if __name__ == "__main__":
+    main()
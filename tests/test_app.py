@@ -0,0 +1,193 @@
+# tests/test_app.py
+import importlib
+import sys
+from types import SimpleNamespace
+
+import orjson
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("insightface")
+
+@pytest.fixture
+def load_app(tmp_path, monkeypatch):
+    """Import gym_api.app with data/ under tmp_path and no model load."""
+    import detector._model
+    # only the detector's input shape is read at import (static batch: no coalescing)
+    det = SimpleNamespace(session=SimpleNamespace(get_inputs=lambda: [SimpleNamespace(shape=[1, 3, "h", "w"])]))
+    monkeypatch.setattr(detector._model, "get_face_app", lambda **kwargs: SimpleNamespace(det_model=det))
+    monkeypatch.chdir(tmp_path)
+    loaded = []
+
+    def _load():
+        sys.modules.pop("gym_api.app", None)
+        mod = importlib.import_module("gym_api.app")
+        loaded.append(mod)
+        return mod
+
+    yield _load
+    for mod in loaded:
+        mod._EVENTS_FH.close()
+    sys.modules.pop("gym_api.app", None)
+
+def test_load_events_migrates_legacy_json(tmp_path, load_app):
+    legacy = [{"person": "marc", "score": 0.7, "camera": "door-1", "timestamp": "2025-01-01T10:00:00"},
+              {"person": "ana", "score": 0.6, "camera": "door-1", "timestamp": "2025-01-01T10:05:00"}]
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "events.json").write_bytes(orjson.dumps(legacy))
+
+    app = load_app()
+    assert app.EVENTS == legacy
+    lines = (tmp_path / "data" / "events.ndjson").read_bytes().splitlines()
+    assert [orjson.loads(l) for l in lines] == legacy
+
+def test_load_events_skips_torn_line(tmp_path, load_app):
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "events.ndjson").write_bytes(b'{"person":"marc"}\n{"person":"an')
+    app = load_app()
+    assert app.EVENTS == [{"person": "marc"}]
+
+def test_should_log_debounces_per_person_and_camera(load_app):
+    app = load_app()
+    w = app.DEDUPE_WINDOW_SEC
+    assert app._should_log("marc", "door-1", now=100.0)
+    assert not app._should_log("marc", "door-1", now=100.0 + w - 0.1)
+    assert app._should_log("marc", "door-2", now=101.0)
+    assert app._should_log("ana", "door-1", now=101.0)
+    assert app._should_log("marc", "door-1", now=100.0 + w)
+    # a skipped event does not extend the window
+    assert not app._should_log("ana", "door-1", now=101.0 + w - 1)
+    assert app._should_log("ana", "door-1", now=101.0 + w)
+
+def test_flusher_wakes_at_flush_max(tmp_path, load_app):
+    import asyncio
+    app = load_app()
+    app.EVENTS_FLUSH_SEC = 60.0  # only the size threshold can trigger a write in time
+    app.EVENTS_FLUSH_MAX = 3
+    log_path = tmp_path / "data" / "events.ndjson"
+
+    async def scenario():
+        await app.start_event_flusher()
+        try:
+            for i in range(2):
+                await asyncio.to_thread(app._append_event, {"i": i})
+            await asyncio.sleep(0.2)
+            assert log_path.read_bytes() == b""
+            await asyncio.to_thread(app._append_event, {"i": 2})  # from a thread, like add_event
+            for _ in range(100):
+                if log_path.read_bytes().count(b"\n") == 3:
+                    break
+                await asyncio.sleep(0.02)
+        finally:
+            app._FLUSH_TASK.cancel()
+        assert [orjson.loads(l) for l in log_path.read_bytes().splitlines()] == [{"i": i} for i in range(3)]
+
+    asyncio.run(scenario())
+
+class _FlakyLog:
+    """Unbuffered-file stand-in whose first writes follow `steps`: an int
+    writes only that many bytes, an exception is raised."""
+
+    def __init__(self, fh, steps):
+        self.fh, self.steps = fh, list(steps)
+
+    def write(self, data):
+        if self.steps:
+            step = self.steps.pop(0)
+            if isinstance(step, BaseException):
+                raise step
+            return self.fh.write(bytes(data[:step]))
+        return self.fh.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.fh, name)
+
+@pytest.mark.parametrize("steps", [
+    [OSError(28, "No space left on device")],       # nothing written
+    [len(b'{"i":0}\n') + 3, OSError(5, "I/O error")],  # one line and a torn one
+])
+def test_flush_retry_writes_each_event_once(tmp_path, load_app, steps):
+    app = load_app()
+    app._EVENTS_FH = _FlakyLog(app._EVENTS_FH, steps)
+    events = [{"i": i} for i in range(3)]
+    for e in events:
+        app._append_event(e)
+
+    with pytest.raises(OSError):
+        app._flush_events()
+    assert list(app._EVENT_QUEUE) == events[len(steps) - 1:]
+    app._flush_events()
+    assert not app._EVENT_QUEUE
+
+    app.load_events()
+    assert app.EVENTS == events
+
+def _gallery(names, seed=0):
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    return {n: rng.standard_normal(512).astype(np.float32) for n in names}
+
+def _json_stamp(app):
+    return app._stamp(app.GALLERY_PATH.stat())
+
+def test_gallery_npy_used_when_built_from_current_json(load_app):
+    import numpy as np
+    app = load_app()
+    app.write_gallery(_gallery(["marc", "ana"]))
+    names, G = app._load_gallery_npy(_json_stamp(app))
+    assert names == ["marc", "ana"]
+    assert isinstance(G, np.memmap)
+
+def test_gallery_npy_rejected_for_stale_sidecar(load_app):
+    import numpy as np
+    app = load_app()
+    app.write_gallery(_gallery(["marc", "ana"], seed=0))
+    old_meta = app.GALLERY_NAMES.read_bytes()
+    new = _gallery(["marc", "ana"], seed=1)
+    app.write_gallery(new)
+    # a slower worker's sidecar (built from the previous gallery.json) lands last
+    app.GALLERY_NAMES.write_bytes(old_meta)
+    assert app._load_gallery_npy(_json_stamp(app)) is None
+    _, G = app.read_gallery_matrix()
+    np.testing.assert_allclose(G[0], new["marc"] / np.linalg.norm(new["marc"]), atol=1e-6)
+
+def test_gallery_npy_rejected_when_replaced(load_app):
+    import numpy as np
+    app = load_app()
+    app.write_gallery(_gallery(["marc", "ana"]))
+    # another writer's matrix renamed over ours: same shape, different inode
+    tmp = app.GALLERY_NPY.with_name("other.npy")
+    np.save(tmp, np.zeros((2, 512), np.float32))
+    tmp.replace(app.GALLERY_NPY)
+    assert app._load_gallery_npy(_json_stamp(app)) is None
+
+def test_gallery_npy_rejected_after_hand_edit(load_app):
+    import numpy as np
+    app = load_app()
+    app.write_gallery(_gallery(["marc", "ana"]))
+    app.read_gallery_matrix()
+    edited = {k: v.tolist() for k, v in _gallery(["marc", "ana", "lea"], seed=2).items()}
+    app.GALLERY_PATH.write_bytes(orjson.dumps(edited))
+    assert app._load_gallery_npy(_json_stamp(app)) is None
+    names, G = app.read_gallery_matrix()
+    assert names == ["marc", "ana", "lea"] and G.shape == (3, 512)
+    # the rebuild re-binds the .npy to the edited file
+    assert app._load_gallery_npy(_json_stamp(app)) is not None
+
+def test_gallery_served_when_data_dir_is_read_only(load_app, monkeypatch):
+    app = load_app()
+    app.write_gallery(_gallery(["marc", "ana"]))
+    app.GALLERY_NPY.unlink()
+    app._GAL_CACHE["stamp"] = None
+
+    def read_only(*args):
+        raise PermissionError(30, "Read-only file system")
+    monkeypatch.setattr(app, "_save_gallery_matrix", read_only)
+    reads = []
+    parse = app._read_gallery_json
+    monkeypatch.setattr(app, "_read_gallery_json", lambda: reads.append(1) or parse())
+
+    for _ in range(3):
+        names, G = app.read_gallery_matrix()
+        assert names == ["marc", "ana"] and G.shape == (2, 512)
+    assert len(reads) == 1  # cached despite the failed save
@@ -0,0 +1,57 @@
+# tests/test_embeddings.py
+import numpy as np
+import pytest
+
+pytest.importorskip("insightface")
+import cv2
+from insightface.data import get_image
+
+from gym_api.services.embeddings import _largest_face_kps, _letterbox, embed_batch
+
+@pytest.fixture(scope="module")
+def face_app():
+    from detector._model import get_face_app
+    try:
+        return get_face_app()
+    except Exception as e:  # buffalo_l not downloaded and no network
+        pytest.skip(f"buffalo_l unavailable: {e}")
+
+@pytest.fixture(scope="module")
+def frames():
+    # group photo bundled with insightface, plus its mirror image
+    img = get_image("t1")
+    return [img, cv2.flip(img, 1)]
+
+def _reference(face_app, img):
+    faces = face_app.get(img)
+    if not faces:
+        return None
+    return max(faces, key=lambda f: (f.bbox[2] - f.bbox[0]) * (f.bbox[3] - f.bbox[1]))
+
+def test_anchor_decode_matches_retinaface_detect(face_app, frames):
+    # _largest_face_kps re-implements RetinaFace.forward/detect on raw outputs;
+    # run it on a batch of one so it works with det_10g's static batch too
+    det = face_app.det_model
+    for img in frames:
+        canvas, scale = _letterbox(img, det.input_size)
+        blob = cv2.dnn.blobFromImages([canvas], 1.0 / det.input_std, det.input_size,
+                                      (det.input_mean,) * 3, swapRB=True)
+        net_outs = det.session.run(det.output_names, {det.input_name: blob})
+        outs = [o.reshape(1, -1, o.shape[-1]) for o in net_outs]
+        kps = _largest_face_kps(det, outs, 0, scale)
+        ref = _reference(face_app, img)
+        assert (kps is None) == (ref is None)
+        if ref is not None:
+            np.testing.assert_allclose(kps, ref.kps, atol=1e-3)
+
+def test_embed_batch_matches_face_app_get(face_app, frames):
+    embs = embed_batch(face_app, frames)
+    assert len(embs) == len(frames)
+    for img, emb in zip(frames, embs):
+        ref = _reference(face_app, img)
+        assert ref is not None and emb is not None
+        cos = float(emb @ ref.embedding) / (np.linalg.norm(emb) * np.linalg.norm(ref.embedding))
+        assert cos > 0.999
+
+def test_embed_batch_no_face(face_app):
+    assert embed_batch(face_app, [np.zeros((480, 640, 3), np.uint8)]) == [None]
@@ -0,0 +1,14 @@
+# tests/test_folder_worker.py
+import pytest
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("PIL")
+
+from detector.folder_worker import list_images
+
+def test_list_images_filters_and_sorts(tmp_path):
+    for name in ("b.jpg", "a.PNG", "c.JPEG", "notes.txt", "d.gif"):
+        (tmp_path / name).write_bytes(b"")
+    (tmp_path / "sub.jpg").mkdir()  # a directory is not an image
+    assert [p.name for p in list_images(tmp_path)] == ["a.PNG", "b.jpg", "c.JPEG"]
+    assert all(p.parent == tmp_path for p in list_images(tmp_path))
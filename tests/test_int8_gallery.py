@@ -0,0 +1,23 @@
+# tests/test_int8_gallery.py
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("onnx")
+pytest.importorskip("onnxruntime")
+
+from gym_api.services.int8_gallery import Int8Gallery
+
+def test_int8_gallery_matches_float_scores():
+    # also proves the MatMulInteger int8 x int8 kernel loads on this onnxruntime
+    rng = np.random.default_rng(0)
+    G = rng.standard_normal((200, 512)).astype(np.float32)
+    G /= np.linalg.norm(G, axis=1, keepdims=True)
+    gq = Int8Gallery(G)
+    for i in (0, 17, 199):
+        q = G[i] + 0.3 * rng.standard_normal(512).astype(np.float32) / np.sqrt(512)
+        qn = q / np.linalg.norm(q)
+        ref = G @ qn
+        got = gq @ qn
+        assert got.dtype == np.float32 and got.shape == ref.shape
+        np.testing.assert_allclose(got, ref, atol=0.02)
+        assert int(got.argmax()) == int(ref.argmax()) == i